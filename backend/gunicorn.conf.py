@@ -0,0 +1,11 @@
+# Production server: gunicorn -c gunicorn.conf.py main:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# One process on purpose: the posts cache, the commit batcher and the async job
+# queue live in memory, and /progress has to reach the process that queued the job.
+# Requests spend their time waiting on GitHub, so threads give the concurrency.
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
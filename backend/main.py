@@ -1,114 +1,559 @@
 import os
-import json
 import base64
-import uuid
-from flask import Flask, request, jsonify
+import secrets
+import mimetypes
+import functools
+import threading
+import queue
+import tempfile
+import time
+from collections import OrderedDict
+import orjson
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from github import Github
+from github import Auth, Github, GithubException, RateLimitExceededException
+from dataclasses import dataclass
 from datetime import datetime
-from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from urllib3.util import Retry
 
 # Load environment variables from .env file
 load_dotenv()
 
+class ORJSONProvider(JSONProvider):
+    """
+    Routes jsonify() and request.json through orjson instead of the stdlib json module.
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # --- CONFIGURATION FROM ENV ---
-GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
-REPO_NAME = os.environ.get("GITHUB_REPO_NAME")
-WEBSITE_URL = os.environ.get("WEBSITE_URL")
+@dataclass(frozen=True, slots=True)
+class Config:
+    github_token: str
+    repo_name: str
+    website_url: str
+    json_path: str
+    upload_folder: str
+    branch: str
+    # Optional S3-compatible blob store (S3, R2, ...) for banner uploads
+    s3_bucket: str | None
+    s3_endpoint_url: str | None
+    s3_public_url: str | None
+
+    @classmethod
+    def load(cls):
+        """
+        Read the environment once. Handlers use the attributes of CFG and
+        never touch os.environ at request time.
+        """
+        github_token = os.environ.get("GITHUB_TOKEN")
+        repo_name = os.environ.get("GITHUB_REPO_NAME")
+        website_url = os.environ.get("WEBSITE_URL")
+
+        # Defaults (can be overridden by env if needed)
+        json_path = os.environ.get("JSON_PATH", "gospel.json")
+        upload_folder = os.environ.get("UPLOAD_FOLDER", "gospel-uploads/")
+        branch = os.environ.get("GITHUB_BRANCH", "main")
+
+        # Direct uploads (credentials come from the usual AWS_* variables)
+        s3_bucket = os.environ.get("S3_BUCKET")
+        s3_endpoint_url = os.environ.get("S3_ENDPOINT_URL") # e.g. https://<account>.r2.cloudflarestorage.com
+        s3_public_url = os.environ.get("S3_PUBLIC_URL") # where uploaded objects are served from
+
+        # Validation: Ensure critical vars exist
+        if not github_token or not repo_name or not website_url:
+            raise ValueError("Missing critical environment variables! Check your .env file.")
 
-# Defaults (can be overridden by env if needed)
-JSON_PATH = os.environ.get("JSON_PATH", "gospel.json")
-UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "gospel-uploads/")
+        # FIX: Ensure UPLOAD_FOLDER ends with a slash to prevent "gospel-uploadsfilename.png" errors
+        if not upload_folder.endswith('/'):
+            upload_folder += '/'
 
-# FIX: Ensure UPLOAD_FOLDER ends with a slash to prevent "gospel-uploadsfilename.png" errors
-if not UPLOAD_FOLDER.endswith('/'):
-    UPLOAD_FOLDER += '/'
+        # FIX: Ensure WEBSITE_URL ends with a slash if needed for path concatenation
+        if not website_url.endswith('/'):
+            website_url += '/'
 
-# FIX: Ensure WEBSITE_URL ends with a slash if needed for path concatenation
-if WEBSITE_URL and not WEBSITE_URL.endswith('/'):
-    WEBSITE_URL += '/'
+        if s3_bucket and not s3_public_url:
+            raise ValueError("S3_BUCKET is set but S3_PUBLIC_URL is missing! Check your .env file.")
 
-# Validation: Ensure critical vars exist
-if not GITHUB_TOKEN or not REPO_NAME or not WEBSITE_URL:
-    raise ValueError("Missing critical environment variables! Check your .env file.")
+        if s3_public_url and not s3_public_url.endswith('/'):
+            s3_public_url += '/'
+
+        return cls(
+            github_token=github_token,
+            repo_name=repo_name,
+            website_url=website_url,
+            json_path=json_path,
+            upload_folder=upload_folder,
+            branch=branch,
+            s3_bucket=s3_bucket,
+            s3_endpoint_url=s3_endpoint_url,
+            s3_public_url=s3_public_url
+        )
+
+CFG = Config.load()
 
 # Allowed extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'pdf'})
+
+# Used when a post arrives without a banner upload
+FALLBACK_BANNER = "https://images.unsplash.com/photo-1504052434569-70ad5836ab65"
+
+# Uploads are base64-encoded in chunks of this size (a multiple of 3, so no padding mid-stream)
+B64_CHUNK_SIZE = 3 * 64 * 1024
 
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+@functools.lru_cache(maxsize=1)
+def _date_label(day_ordinal):
+    # Keyed on the day, so strftime runs once per day rather than once per post
+    return datetime.fromordinal(day_ordinal).strftime("%b %d, %Y")
+
+# --- BLOB STORE ---
+# Presigned PUT URLs let the app upload banners straight to the bucket, so the
+# bytes never pass through this server or end up in the GitHub repo.
+UPLOAD_URL_EXPIRY = 15 * 60 # seconds
+
+@functools.lru_cache(maxsize=1)
+def _get_s3():
+    # Imported here so deployments without a bucket never load (or need) boto3
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    return boto3.client(
+        "s3",
+        endpoint_url=CFG.s3_endpoint_url,
+        config=BotoConfig(signature_version="s3v4")
+    )
+
+# --- GITHUB CLIENT ---
+# Build the client once per process and reuse it (this also keeps the HTTP
+# connection pool warm). Only idempotent requests are retried on gateway errors
+# (urllib3's default allowed_methods leave POST alone, so a commit is never sent twice).
+GITHUB_POOL_SIZE = 16
+GITHUB_RETRY = Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+
+@functools.lru_cache(maxsize=1)
+def _get_github():
+    return Github(
+        auth=Auth.Token(CFG.github_token),
+        per_page=100,
+        pool_size=GITHUB_POOL_SIZE,
+        retry=GITHUB_RETRY
+    )
+
+@functools.lru_cache(maxsize=1)
+def _get_repo():
+    # Only used to build REST URLs, so skip the metadata GET
+    return _get_github().get_repo(CFG.repo_name, lazy=True)
+
+def _graphql_errors(data):
+    return (data.get("errors") or []) if isinstance(data, dict) else []
+
+def _graphql(query, variables):
+    """
+    Run a GraphQL request. GitHub reports GraphQL failures, including the primary
+    rate limit, as HTTP 200 with an `errors` array, which PyGithub turns into a
+    plain GithubException(400). Rate limits are re-raised as
+    RateLimitExceededException so the usual backoff kicks in.
+    """
+    try:
+        headers, result = _get_github().requester.graphql_query(query, variables)
+    except GithubException as e:
+        _raise_if_rate_limited(e.data, e.headers)
+        raise
+    if _graphql_errors(result):
+        _raise_if_rate_limited(result, headers)
+        raise GithubException(400, result, headers)
+    return result["data"]
+
+def _raise_if_rate_limited(data, headers):
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    if headers.get("x-ratelimit-remaining") == "0" or any(
+        error.get("type") == "RATE_LIMITED" for error in _graphql_errors(data)
+    ):
+        raise RateLimitExceededException(403, data, headers)
+
+def _is_stale_head(e):
+    """
+    True if createCommitOnBranch refused the commit because the branch moved
+    past expectedHeadOid.
+    """
+    return any(
+        error.get("type") == "STALE_DATA" or "Expected branch to point to" in (error.get("message") or "")
+        for error in _graphql_errors(e.data)
+    )
+
+def _encode_stream(stream):
+    """
+    Base64-encode a file stream chunk by chunk, so the raw upload (which
+    Werkzeug spools to disk) is never held in memory next to its encoding.
+    """
+    return "".join(
+        base64.b64encode(chunk).decode('ascii')
+        for chunk in iter(lambda: stream.read(B64_CHUNK_SIZE), b"")
+    )
+
+# Branch head and posts file in one round-trip. Both come from the same commit,
+# so the text always matches the oid we later pass as expectedHeadOid.
+POSTS_QUERY = """
+query($owner: String!, $name: String!, $ref: String!, $path: String!) {
+  repository(owner: $owner, name: $name) {
+    ref(qualifiedName: $ref) {
+      target {
+        oid
+        ... on Commit {
+          file(path: $path) {
+            object { ... on Blob { oid text isTruncated } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Every file of a post (banner + JSON) in a single commit, in a single request
+COMMIT_MUTATION = """
+mutation($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) {
+    commit { oid }
+  }
+}
+"""
+
+# --- RATE LIMIT ---
+# Once GitHub reports the token out of quota, answer 429 locally until the reset
+# time instead of sending requests that are bound to fail.
+_rate_limited_until = 0.0
+
+def _note_rate_limit(e):
+    global _rate_limited_until
+    now = time.time()
+    # Only look at the failed response itself: asking the client for its reset
+    # time can fire a live GET /rate_limit from inside the error handler
+    headers = {k.lower(): v for k, v in (e.headers or {}).items()}
+    try:
+        if headers.get("retry-after"):
+            # Secondary rate limit
+            until = now + int(headers["retry-after"])
+        else:
+            until = float(headers.get("x-ratelimit-reset", 0))
+    except ValueError:
+        until = 0
+    # No usable reset time: back off for a minute
+    _rate_limited_until = until if until > now else now + 60
+    print(f"GitHub rate limit hit, pausing until {datetime.fromtimestamp(_rate_limited_until)}")
+
+def _rate_limit_response():
+    """
+    429 response while the GitHub rate limit window is open, otherwise None.
+    """
+    wait = _rate_limited_until - time.time()
+    if wait <= 0:
+        return None
+    return jsonify({"error": "GitHub rate limit exceeded, try again later"}), 429, {"Retry-After": str(int(wait) + 1)}
+
+# --- POSTS CACHE ---
+# Parsed posts, as an OrderedDict of id -> post in feed order (newest first), plus
+# the branch head commit they were read at. Keying by id makes adding and
+# deleting a post O(1) instead of rebuilding or scanning the list.
+# Each write is one createCommitOnBranch with expectedHeadOid set to the cached
+# head; if the branch moved in the meantime GitHub rejects it and we re-read
+# once before trying again.
+_posts_lock = threading.Lock()
+_posts_cache = {"head": None, "data": None}
+
+class PostNotFound(Exception):
+    pass
+
+def _index_posts(posts):
+    index = OrderedDict()
+    for i, post in enumerate(posts):
+        key = post.get('id') if isinstance(post, dict) else None
+        try:
+            usable = key is not None and key not in index
+        except TypeError:
+            # Unhashable id (list, object, ...)
+            usable = False
+        if not usable:
+            # No usable id: keep the entry under a private key so it is still written back
+            key = ("unkeyed", i)
+        index[key] = post
+    return index
+
+def _refresh_posts():
+    owner, name = CFG.repo_name.split('/', 1)
+    data = _graphql(POSTS_QUERY, {
+        "owner": owner,
+        "name": name,
+        "ref": f"refs/heads/{CFG.branch}",
+        "path": CFG.json_path
+    })
+    head = data["repository"]["ref"]["target"]
+
+    # Only a missing file means "no posts yet". Any other failure propagates:
+    # treating it as an empty feed would wipe every post on the next commit.
+    if head["file"] is None:
+        posts = OrderedDict()
+    else:
+        blob = head["file"]["object"]
+        if blob["isTruncated"]:
+            # GraphQL cuts off large blobs; the REST blob API still returns them whole
+            raw = base64.b64decode(_get_repo().get_git_blob(blob["oid"]).content)
+        else:
+            raw = blob["text"]
+        posts = _index_posts(orjson.loads(raw))
+
+    # Swap both together: a new head next to old posts would let the next
+    # commit pass expectedHeadOid and silently drop whatever changed upstream
+    _posts_cache["head"] = head["oid"]
+    _posts_cache["data"] = posts
+
+def _commit_posts(apply, message, files=()):
+    """
+    Read-modify-write the posts JSON through the cache.
+    `apply` edits the cached posts in place (or raises PostNotFound before
+    touching them). `files` are extra (path, base64) pairs that land in the same
+    commit as the JSON. If the commit fails, the cache is dropped and read again
+    on the next write.
+    """
+    with _posts_lock:
+        for attempt in range(2):
+            if attempt or _posts_cache["data"] is None:
+                _refresh_posts()
+            posts = _posts_cache["data"]
+            try:
+                apply(posts)
+                # Minified: the site does not care about whitespace, and indenting roughly doubles the upload
+                updated_json = orjson.dumps(list(posts.values()))
+
+                additions = [{"path": path, "contents": contents} for path, contents in files]
+                additions.append({
+                    "path": CFG.json_path,
+                    "contents": base64.b64encode(updated_json).decode('ascii')
+                })
+                result = _graphql(COMMIT_MUTATION, {"input": {
+                    "branch": {"repositoryNameWithOwner": CFG.repo_name, "branchName": CFG.branch},
+                    "message": {"headline": message},
+                    "expectedHeadOid": _posts_cache["head"],
+                    "fileChanges": {"additions": additions}
+                }})
+            except PostNotFound:
+                # The cache may predate the post; only trust a fresh read
+                if attempt:
+                    raise
+            except Exception as e:
+                # apply() may already have edited the cached posts
+                _posts_cache["data"] = None
+                # Only a stale expectedHeadOid is worth a re-read and a second try
+                if attempt or not isinstance(e, GithubException) or not _is_stale_head(e):
+                    raise
+            else:
+                _posts_cache["head"] = result["createCommitOnBranch"]["commit"]["oid"]
+                return
+
+# --- POST BATCHER ---
+# Posts that arrive while a commit is in flight are queued and go out together
+# in the next commit. The first caller to find no commit in flight leads: it
+# drains everything pending into one commit and then wakes the callers whose
+# posts it carried. Nobody waits on a timer, so a lone post is not delayed.
+_batch_cond = threading.Condition()
+_batch_pending = []
+_batch_leading = False
+
+def _publish_post(new_post, files=()):
+    global _batch_leading
+    entry = {"post": new_post, "files": list(files), "done": False, "error": None}
+
+    with _batch_cond:
+        _batch_pending.append(entry)
+        while _batch_leading and not entry["done"]:
+            _batch_cond.wait()
+        leader = not entry["done"]
+        if leader:
+            _batch_leading = True
+            batch = _batch_pending[:]
+            _batch_pending.clear()
+
+    if leader:
+        # Newest post first, same as the feed
+        new_posts = [item["post"] for item in reversed(batch)]
+
+        def prepend(posts):
+            for post in reversed(new_posts):
+                posts[post['id']] = post
+                posts.move_to_end(post['id'], last=False)
+
+        if len(new_posts) == 1:
+            message = f"New post: {new_posts[0]['title']}"
+        else:
+            message = "New posts: " + ", ".join(post['title'] for post in new_posts)
+
+        error = None
+        try:
+            _commit_posts(prepend, message, files=[f for item in batch for f in item["files"]])
+        except Exception as e:
+            error = e
+
+        with _batch_cond:
+            for item in batch:
+                item["done"] = True
+                item["error"] = error
+            _batch_leading = False
+            _batch_cond.notify_all()
+
+    if entry["error"]:
+        raise entry["error"]
+
+# --- BACKGROUND JOBS ---
+# /add-post?async=1 answers 202 right away and leaves the GitHub commit to a
+# worker thread. The client follows the outcome on /progress/<post_id> (SSE).
+# One worker is enough: commits serialize on _posts_lock anyway.
+PROGRESS_TIMEOUT = 120 # seconds /progress waits for the next event
+JOB_TTL = 10 * 60 # seconds a finished job stays readable on /progress
+
+_job_queue = queue.Queue()
+_jobs = {} # post_id -> {"events": Queue of status events, "finished": time or None}
+
+def _expire_jobs():
+    # Clients that never poll (or disconnect early) would otherwise leave their job behind forever
+    cutoff = time.time() - JOB_TTL
+    for job_id, job in list(_jobs.items()):
+        if job["finished"] and job["finished"] < cutoff:
+            _jobs.pop(job_id, None)
+
+def _post_worker():
+    while True:
+        new_post, banner_path, tmp_path = _job_queue.get()
+        job = _jobs[new_post['id']]
+        events = job["events"]
+        events.put({"status": "running"})
+        try:
+            files = []
+            if tmp_path:
+                with open(tmp_path, 'rb') as f:
+                    files.append((banner_path, _encode_stream(f)))
+            _publish_post(new_post, files)
+            events.put({
+                "status": "done",
+                "id": new_post['id'],
+                "url": new_post['mediaUrl'],
+                "banner_url": new_post['banner']
+            })
+        except Exception as e:
+            if isinstance(e, RateLimitExceededException):
+                _note_rate_limit(e)
+            print(f"Job Error ({new_post['id']}): {e}")
+            events.put({"status": "error", "error": str(e)})
+        finally:
+            job["finished"] = time.time()
+            if tmp_path:
+                os.remove(tmp_path)
+            _expire_jobs()
+
+threading.Thread(target=_post_worker, name="post-worker", daemon=True).start()
+
+# --- STARTUP PREWARM ---
+def _prewarm():
+    """
+    Open the pooled connection to api.github.com and fill the posts cache in
+    the background, so the first request does not pay for DNS + TLS + a cold read.
+    """
+    try:
+        with _posts_lock:
+            if _posts_cache["data"] is None:
+                _refresh_posts()
+    except Exception as e:
+        # Not fatal: the first write reads the posts itself
+        if isinstance(e, RateLimitExceededException):
+            _note_rate_limit(e)
+        print(f"Prewarm failed: {e}")
+
+threading.Thread(target=_prewarm, name="github-prewarm", daemon=True).start()
 
 # --- HEALTH CHECK ROUTE ---
+# The body never changes, so serialize it once instead of on every probe
+HEALTH_BODY = orjson.dumps({
+    "status": "online",
+    "message": "MACE EU Content Manager API is running...",
+    "repo": CFG.repo_name
+})
+
 @app.route('/', methods=['GET'])
 def health_check():
     """
     Simple route to check if server is reachable.
     """
-    return jsonify({
-        "status": "online",
-        "message": "MACE EU Content Manager API is running...",
-        "repo": REPO_NAME
-    }), 200
+    return Response(HEALTH_BODY, status=200, mimetype="application/json")
 
 # --- ADD POST ROUTE ---
 @app.route('/add-post', methods=['POST'])
 def add_post():
+    limited = _rate_limit_response()
+    if limited:
+        return limited
+
     try:
         # Debugging: Print what the server receives
         print("--- NEW UPLOAD REQUEST ---")
         # print("Form Data:", request.form) # Uncomment if needed
         # print("Files:", request.files)    # Uncomment if needed
 
-        # 1. Connect to GitHub
-        g = Github(GITHUB_TOKEN)
-        repo = g.get_repo(REPO_NAME)
-
-        # 2. Get Form Data
+        # 1. Get Form Data
         title = request.form.get('title')
         author = request.form.get('author')
         content = request.form.get('content')
         post_type = request.form.get('type') # 'article', 'image', 'video' (youtube), 'pdf'
         media_url_input = request.form.get('mediaUrl', '') # The link (YouTube/PDF)
+        banner_url_input = request.form.get('bannerUrl', '') # Banner already uploaded via /upload-url
 
         if not title or not author:
             return jsonify({"error": "Title and Author are required"}), 400
 
-        # --- 3. HANDLE BANNER IMAGE (Required) ---
+        # --- 2. HANDLE BANNER IMAGE (Required) ---
         banner_full_url = ""
+        banner_file = None
+        banner_path = None
         
         if 'file' in request.files:
             file = request.files['file']
             if file and allowed_file(file.filename):
-                ext = file.filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{uuid.uuid4().hex}.{ext}"
+                ext = file.filename.rpartition('.')[2].lower()
+                unique_filename = f"{secrets.token_hex(16)}.{ext}"
                 
                 # Correct Path Construction (now safe due to the fix at top of file)
-                repo_path = f"{UPLOAD_FOLDER}{unique_filename}"
+                repo_path = f"{CFG.upload_folder}{unique_filename}"
                 
                 print(f"Uploading banner to: {repo_path}") 
 
-                # Upload Banner to GitHub
-                repo.create_file(
-                    path=repo_path,
-                    message=f"Upload banner: {title}",
-                    content=file.read(),
-                    branch="main" 
-                )
+                # Banner goes to GitHub in the same commit as the JSON below
+                banner_file = file
+                banner_path = repo_path
                 
                 # Construct the full URL
-                banner_full_url = f"{WEBSITE_URL}{repo_path}"
+                banner_full_url = f"{CFG.website_url}{repo_path}"
+
+        elif CFG.s3_public_url and banner_url_input.startswith(CFG.s3_public_url):
+            # Uploaded straight to the blob store; only the URL goes into the post
+            banner_full_url = banner_url_input
         
         # Fallback if no banner sent
         if not banner_full_url:
              print("Warning: No file uploaded, using fallback banner.")
-             banner_full_url = "https://images.unsplash.com/photo-1504052434569-70ad5836ab65" 
+             banner_full_url = FALLBACK_BANNER
 
-        # --- 4. DETERMINE FINAL MEDIA CONFIGURATION ---
+        # --- 3. DETERMINE FINAL MEDIA CONFIGURATION ---
         final_media_url = ""
         final_media_type = "none"
 
@@ -132,12 +577,12 @@ def add_post():
             final_media_url = ""
             final_media_type = "none"
 
-        # --- 5. CREATE POST OBJECT ---
+        # --- 4. CREATE POST OBJECT ---
         new_post = {
-            "id": str(uuid.uuid4()),
+            "id": secrets.token_hex(16),
             "title": title,
             "author": author,
-            "date": datetime.now().strftime("%b %d, %Y"),
+            "date": _date_label(datetime.now().toordinal()),
             "type": post_type,
             "banner": banner_full_url,      # Banner is the uploaded image
             "content": content,
@@ -145,22 +590,28 @@ def add_post():
             "mediaUrl": final_media_url     # Content is the Link
         }
 
-        # --- 6. UPDATE JSON ---
-        try:
-            file_content = repo.get_contents(JSON_PATH)
-            existing_data = json.loads(base64.b64decode(file_content.content).decode('utf-8'))
-        except:
-            existing_data = []
-            file_content = None
-
-        existing_data.insert(0, new_post)
-        updated_json = json.dumps(existing_data, indent=2)
-
-        commit_msg = f"New post: {title}"
-        if file_content:
-            repo.update_file(JSON_PATH, commit_msg, updated_json, file_content.sha)
-        else:
-            repo.create_file(JSON_PATH, commit_msg, updated_json)
+        # --- 5. UPDATE JSON ---
+        if request.args.get('async') == '1':
+            # Park the banner on disk, hand the commit to the worker and answer right away
+            tmp_path = None
+            if banner_file:
+                with tempfile.NamedTemporaryFile(delete=False) as tmp:
+                    banner_file.save(tmp)
+                tmp_path = tmp.name
+
+            _jobs[new_post['id']] = {"events": queue.Queue(), "finished": None}
+            _job_queue.put((new_post, banner_path, tmp_path))
+
+            return jsonify({
+                "message": "Accepted",
+                "id": new_post['id'],
+                "url": final_media_url,
+                "banner_url": banner_full_url,
+                "progress": f"/progress/{new_post['id']}"
+            }), 202
+
+        files = [(banner_path, _encode_stream(banner_file.stream))] if banner_file else []
+        _publish_post(new_post, files)
 
         return jsonify({
             "message": "Success", 
@@ -169,13 +620,82 @@ def add_post():
             "banner_url": banner_full_url
         }), 200
 
+    except RateLimitExceededException as e:
+        _note_rate_limit(e)
+        return _rate_limit_response()
+
     except Exception as e:
         print(f"Server Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+# --- UPLOAD URL ROUTE ---
+@app.route('/upload-url', methods=['POST'])
+def upload_url():
+    """
+    Hand out a presigned PUT URL for a banner. The client uploads the file there
+    and then calls /add-post with bannerUrl instead of a file.
+    """
+    if not CFG.s3_bucket:
+        return jsonify({"error": "Direct uploads are not configured"}), 503
+
+    try:
+        filename = (request.json or {}).get('filename', '')
+        if not allowed_file(filename):
+            return jsonify({"error": "File type not allowed"}), 400
+
+        ext = filename.rpartition('.')[2].lower()
+        key = f"{CFG.upload_folder}{secrets.token_hex(16)}.{ext}"
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        url = _get_s3().generate_presigned_url(
+            "put_object",
+            Params={"Bucket": CFG.s3_bucket, "Key": key, "ContentType": content_type},
+            ExpiresIn=UPLOAD_URL_EXPIRY
+        )
+
+        return jsonify({
+            "uploadUrl": url,
+            "headers": {"Content-Type": content_type}, # must be sent with the PUT
+            "bannerUrl": f"{CFG.s3_public_url}{key}"
+        }), 200
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# --- JOB PROGRESS ROUTE ---
+@app.route('/progress/<job_id>', methods=['GET'])
+def progress(job_id):
+    """
+    Server-Sent Events stream for a post queued with /add-post?async=1.
+    Ends after the 'done' or 'error' event.
+    """
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    events = job["events"]
+
+    def stream():
+        while True:
+            try:
+                event = events.get(timeout=PROGRESS_TIMEOUT)
+            except queue.Empty:
+                yield f"data: {orjson.dumps({'status': 'timeout'}).decode('utf-8')}\n\n"
+                return
+            yield f"data: {orjson.dumps(event).decode('utf-8')}\n\n"
+            if event["status"] in ("done", "error"):
+                _jobs.pop(job_id, None)
+                return
+
+    return Response(stream(), mimetype="text/event-stream")
+
 # --- DELETE POST ROUTE ---
 @app.route('/delete-post', methods=['POST'])
 def delete_post():
+    limited = _rate_limit_response()
+    if limited:
+        return limited
+
     try:
         # 1. Get the ID to delete
         data = request.json
@@ -184,32 +704,30 @@ def delete_post():
         if not post_id:
             return jsonify({"error": "Post ID is required"}), 400
 
-        # 2. Connect to GitHub
-        g = Github(GITHUB_TOKEN)
-        repo = g.get_repo(REPO_NAME)
-        
-        # 3. Fetch gospel.json
-        file_content = repo.get_contents(JSON_PATH)
-        existing_data = json.loads(base64.b64decode(file_content.content).decode('utf-8'))
-        
-        # 4. Filter out the post with the matching ID
-        # We keep everything that does NOT match the ID
-        new_data = [post for post in existing_data if post.get('id') != post_id]
-        
-        # Check if anything was actually removed
-        if len(new_data) == len(existing_data):
-            return jsonify({"error": "Post not found"}), 404
+        if not isinstance(post_id, str):
+            return jsonify({"error": "Post ID must be a string"}), 400
+
+        # 2. Filter out the post with the matching ID and commit
+        def remove(posts):
+            if posts.pop(post_id, None) is None:
+                raise PostNotFound(post_id)
 
-        # 5. Commit changes
-        updated_json = json.dumps(new_data, indent=2)
-        repo.update_file(JSON_PATH, f"Delete post: {post_id}", updated_json, file_content.sha)
+        try:
+            _commit_posts(remove, f"Delete post: {post_id}")
+        except PostNotFound:
+            return jsonify({"error": "Post not found"}), 404
         
         return jsonify({"message": "Post deleted successfully"}), 200
 
+    except RateLimitExceededException as e:
+        _note_rate_limit(e)
+        return _rate_limit_response()
+
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
+    # Development server only; in production use: gunicorn -c gunicorn.conf.py main:app
     # Run on 0.0.0.0 to make it accessible to your Flutter app on the network
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file